@@ -0,0 +1,165 @@
+"""
+Database layer for the Strength Prescriptor app: engine, models and sessions.
+
+Kept out of the Streamlit script so that it is imported once per process
+instead of being re-executed on every rerun.
+"""
+from __future__ import annotations
+import datetime as dt
+
+import streamlit as st
+from sqlalchemy import (
+    create_engine,
+    event,
+    Column,
+    Integer,
+    String,
+    Float,
+    Date,
+    ForeignKey,
+    Text,
+    DateTime,
+    Boolean,
+    Index,
+)
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+
+# -----------------------------
+# DB SETUP (SQLite for MVP)
+# -----------------------------
+# The engine is created once per process; its default pool hands each Session
+# its own connection, so concurrent browser sessions never share a transaction.
+@st.cache_resource
+def get_engine():
+    engine = create_engine(
+        "sqlite:///strength_only.db",
+        echo=False,
+        future=True,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, _):
+        # WAL + relaxed fsync, bigger page cache and mmap reads
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA mmap_size=268435456")
+        cur.execute("PRAGMA cache_size=-8000")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.close()
+
+    return engine
+
+
+Base = declarative_base()
+
+
+# -----------------------------
+# MODELS
+# -----------------------------
+class User(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True)
+    email = Column(String, unique=True, nullable=False)
+    name = Column(String, nullable=False)
+    role = Column(String, default="coach")  # coach | client | admin
+    hash = Column(String, nullable=False)  # placeholder, do not store plain in prod
+    created_at = Column(DateTime, default=dt.datetime.utcnow)
+
+
+class Client(Base):
+    __tablename__ = "clients"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    sex = Column(String)
+    dob = Column(Date)
+    height_cm = Column(Float)
+    weight_kg = Column(Float)
+    notes = Column(Text, default="")
+    owner_id = Column(Integer, ForeignKey("users.id"))  # coach owner
+    # joined: a Client is always shown by its user's name, so load them together
+    user = relationship("User", foreign_keys=[user_id], lazy="joined")
+    owner = relationship("User", foreign_keys=[owner_id])
+
+
+class Exercise(Base):
+    __tablename__ = "exercises"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True)
+    category = Column(String)  # squat, hinge, push, pull, core, plyo
+    equipment = Column(String)
+    unilateral = Column(Boolean, default=False)
+    description = Column(Text, default="")
+
+
+class TrainingPlan(Base):
+    __tablename__ = "training_plans"
+    id = Column(Integer, primary_key=True)
+    client_id = Column(Integer, ForeignKey("clients.id"))
+    name = Column(String)
+    start_date = Column(Date)
+    end_date = Column(Date)
+    goal = Column(Text)
+    client = relationship("Client")
+
+
+class TrainingSession(Base):
+    __tablename__ = "training_sessions"
+    id = Column(Integer, primary_key=True)
+    plan_id = Column(Integer, ForeignKey("training_plans.id"))
+    date = Column(Date)
+    focus = Column(String)
+    notes = Column(Text, default="")
+    plan = relationship("TrainingPlan")
+    sets = relationship("SetPrescription", back_populates="session", lazy="selectin", order_by="SetPrescription.id")
+
+    __table_args__ = (Index("ix_ts_plan_date", "plan_id", "date"),)
+
+
+class SetPrescription(Base):
+    __tablename__ = "set_prescriptions"
+    id = Column(Integer, primary_key=True)
+    session_id = Column(Integer, ForeignKey("training_sessions.id"))
+    exercise_id = Column(Integer, ForeignKey("exercises.id"))
+    sets = Column(Integer)
+    reps = Column(Integer)
+    intensity_pct_1rm = Column(Float)  # e.g., 75 => 75%1RM
+    load_kg = Column(Float)            # kg per rep
+    rest_sec = Column(Integer)
+    notes = Column(Text, default="")
+    session = relationship("TrainingSession", back_populates="sets")
+    exercise = relationship("Exercise")
+
+
+class StrengthTest(Base):
+    __tablename__ = "strength_tests"
+    id = Column(Integer, primary_key=True)
+    client_id = Column(Integer, ForeignKey("clients.id"))
+    exercise_id = Column(Integer, ForeignKey("exercises.id"))
+    date = Column(Date)
+    one_rm_kg = Column(Float)  # validated or estimated 1RM
+    notes = Column(Text, default="")
+    client = relationship("Client")
+    exercise = relationship("Exercise")
+
+    __table_args__ = (Index("ix_st_client_ex_date", "client_id", "exercise_id", "date"),)
+
+
+# -----------------------------
+# SCHEMA & SESSIONS
+# -----------------------------
+def create_schema(engine):
+    Base.metadata.create_all(engine)
+    # create_all skips tables that already exist, so add any missing indexes too
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+@st.cache_resource
+def get_sessionmaker():
+    # First call per process also makes sure the schema exists
+    engine = get_engine()
+    create_schema(engine)
+    return sessionmaker(bind=engine, expire_on_commit=False)